@@ -1,55 +1,96 @@
 import argparse
 import time
-import tempfile
 import os
 import json
 import logging
 
-from preprocessing.setup import preprocess_data
-from preprocessing.lookup import neighbour_lookup
-from preprocessing.gpx_extractor import extract_gpx_data
+import numpy as np
+import shapely
+from concurrent.futures import ThreadPoolExecutor
+
+from preprocessing.setup import preprocess_data, to_lambert
+from preprocessing.gpx_extractor import extract_points_arrays, extract_points_arrays_from_bytes
+
+# The tree and prepared geometries are read-only after preprocessing and GEOS
+# releases the GIL, so slicing the bulk query across threads scales with cores.
+_n_workers = os.cpu_count() or 1
+_executor = ThreadPoolExecutor(max_workers=_n_workers)
+
+# only split the query when a slice is still big enough to amortize the
+# thread handoff
+_min_slice = 2000
+
+# consecutive points closer than this are treated as the same location
+_min_step_m = 20.0
+
+def _query_tree_slice(args):
+    xs, ys = args
+    _, tree_idx = tree.query(shapely.points(xs, ys), predicate='covered_by')
+    return tree_idx
+
+# One-slot locality cache: index of the region that covered the most points in
+# the last bulk query. Successive GPX points (and successive uploads covering
+# the same area) overwhelmingly land in the same region, so one cheap
+# contains_xy pass removes most points before they ever reach the tree.
+_cached_region_idx = -1
 
 def process_gpx_path(path):
+    return _process_points(*extract_points_arrays(path), label=path)
+
+def process_gpx_bytes(bts):
+    # parse straight from memory, no tempfile round trip
+    return _process_points(*extract_points_arrays_from_bytes(bts), label="<upload>")
+
+def _process_points(lats, lons, label):
     logger = logging.getLogger(__name__)
     start = time.time()
-    gpx_data = extract_gpx_data(path)
 
+    global _cached_region_idx
     found_regions = set()
-    current_region = ""
-    for track in gpx_data.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                current_region = neighbour_lookup(
-                    point,
-                    current_region,
-                    region_map,
-                    neighbour_map,
-                    provinces_lookup,
-                    provinces_regions_map,
-                )
-                if current_region:
-                    found_regions.add(current_region)
+    if len(lons) > 0:
+        # project the whole track into the metric CRS of the region geometries
+        xs, ys = to_lambert.transform(lons, lats)
+
+        # thin dense sampling: quantize cumulative track length into
+        # _min_step_m bins and keep the first point of each, so every dropped
+        # point lies within _min_step_m along the track of a kept one — the
+        # bound holds no matter how many consecutive points are dropped
+        if len(xs) > 1:
+            steps = np.sqrt(np.diff(xs) ** 2 + np.diff(ys) ** 2)
+            bins = (np.concatenate(([0.0], np.cumsum(steps))) // _min_step_m).astype(np.intp)
+            keep = np.concatenate(([True], bins[1:] != bins[:-1]))
+            xs, ys = xs[keep], ys[keep]
+
+        # loops and out-and-back sections revisit the same coordinates; round
+        # to a 1 m grid and test each location only once
+        unique_pts = np.unique(np.stack([np.round(xs), np.round(ys)], axis=1), axis=0)
+        xs, ys = unique_pts[:, 0], unique_pts[:, 1]
+
+        if _cached_region_idx >= 0:
+            hits = shapely.contains_xy(region_geoms[_cached_region_idx], xs, ys)
+            if hits.any():
+                found_regions.add(region_names[_cached_region_idx])
+                xs, ys = xs[~hits], ys[~hits]
+
+        if len(xs) > 0:
+            # Bulk tree query for the remaining points, sliced across the
+            # worker threads; each slice is one vectorized C call.
+            n_slices = max(1, min(_n_workers, len(xs) // _min_slice))
+            tree_idx = np.concatenate(list(_executor.map(
+                _query_tree_slice,
+                zip(np.array_split(xs, n_slices), np.array_split(ys, n_slices)),
+            )))
+            if len(tree_idx) > 0:
+                found_regions |= set(region_names[np.unique(tree_idx)])
+                _cached_region_idx = int(np.argmax(np.bincount(tree_idx)))
 
     elapsed = time.time() - start
-    logger.info("Processed %s: found %d regions in %.2fs", path, len(found_regions), elapsed)
+    logger.info("Processed %s: found %d regions in %.2fs", label, len(found_regions), elapsed)
 
     return {
         "regions": sorted(found_regions),
     }
 
-def process_gpx_bytes(bts):
-    # write to temp file and reuse path-based extractor
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".gpx") as tmp:
-        tmp.write(bts)
-        tmp_path = tmp.name
-    try:
-        return process_gpx_path(tmp_path)
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a GPX file or run a small JSON backend.")
     parser.add_argument('-f', '--file', required=False, help="path to your GPX file")
@@ -58,10 +99,8 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
     # load preprocessing data once
-    region_map, neighbour_map, provinces_lookup, provinces_regions_map = preprocess_data(
+    region_names, region_geoms, neighbour_idx, tree = preprocess_data(
         "neighbours_map_5.0.json",
-        "province_map.json",
-        "BELGIUM_-_Provinces.geojson",
         "BELGIUM_-_Municipalities.geojson",
     )
 
@@ -95,5 +134,10 @@ if __name__ == "__main__":
             result = process_gpx_path(path)
             return jsonify(result)
 
-        # run on localhost:5000
-        app.run(host="127.0.0.1", port=5000)
\ No newline at end of file
+        # run on localhost:5000; waitress serves requests on a real thread
+        # pool so concurrent uploads don't serialize on Flask's dev server
+        try:
+            from waitress import serve
+            serve(app, host="127.0.0.1", port=5000, threads=_n_workers)
+        except ImportError:
+            app.run(host="127.0.0.1", port=5000)
\ No newline at end of file
@@ -1,27 +1,102 @@
+import io
+
 import gpxpy
+import numpy as np
+from lxml import etree
 from pathlib import Path
 
-def extract_gpx_data(gpx_path: str):
+def _decode_gpx_bytes(data: bytes) -> str:
     """
-        Extract GPX data from the given file path, handling various encodings.
+        Decode raw GPX bytes, handling various encodings.
+    """
+    for enc in ('utf-8', 'utf-8-sig', 'cp1252', 'latin-1'):
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+def _iterparse_points(source):
+    """
+        Stream the trkpt lat/lon attributes from an XML source into numpy arrays.
+    """
+    lats, lons = [], []
+    for _, elem in etree.iterparse(source, tag='{*}trkpt'):
+        lats.append(elem.attrib['lat'])
+        lons.append(elem.attrib['lon'])
+        elem.clear()
+    return np.array(lats, dtype=float), np.array(lons, dtype=float)
+
+def _points_from_gpx(gpx_data):
+    """
+        Collect track point coordinates from a parsed gpxpy object into numpy arrays.
+    """
+    points = [
+        (p.latitude, p.longitude)
+        for t in gpx_data.tracks for s in t.segments for p in s.points
+    ]
+    lats = np.array([p[0] for p in points], dtype=float)
+    lons = np.array([p[1] for p in points], dtype=float)
+    return lats, lons
+
+def extract_points_arrays(gpx_path: str):
+    """
+        Extract only the track point coordinates from a GPX file into numpy arrays.
+
+        Streams the trkpt attributes with lxml's iterparse instead of building a
+        gpxpy object per point; falls back to the full gpxpy parser for files
+        that are not clean XML.
 
         Arguments:
         - gpx_path: Path to the GPX file.
+
+        Returns:
+        - (lats, lons): Two float arrays with the track point coordinates.
     """
     gpx_file_path = Path(gpx_path)
     if not gpx_file_path.exists():
         raise SystemExit(f"GPX file not found: {gpx_path}")
 
-    data = gpx_file_path.read_bytes()
-    gpx_text = ""
+    try:
+        return _iterparse_points(str(gpx_file_path))
+    except (etree.XMLSyntaxError, KeyError, ValueError):
+        # broken encodings or malformed attributes: let gpxpy sort it out
+        return _points_from_gpx(extract_gpx_data(gpx_path))
 
-    for enc in ('utf-8', 'utf-8-sig', 'cp1252', 'latin-1'):
-        try:
-            gpx_text = data.decode(enc)
-            break
-        except UnicodeDecodeError:
-            continue
-    else:
-        gpx_text = data.decode('utf-8', errors='replace')
+def extract_points_arrays_from_bytes(bts: bytes):
+    """
+        Extract the track point coordinates from in-memory GPX bytes into numpy
+        arrays, without touching the filesystem.
+
+        Arguments:
+        - bts: The raw GPX document.
+
+        Returns:
+        - (lats, lons): Two float arrays with the track point coordinates.
+    """
+    try:
+        return _iterparse_points(io.BytesIO(bts))
+    except (etree.XMLSyntaxError, KeyError, ValueError):
+        return _points_from_gpx(extract_gpx_from_text(_decode_gpx_bytes(bts)))
+
+def extract_gpx_from_text(gpx_text: str):
+    """
+        Parse GPX data from an already-decoded string.
+
+        Arguments:
+        - gpx_text: The GPX document text.
+    """
+    return gpxpy.parse(gpx_text)
+
+def extract_gpx_data(gpx_path: str):
+    """
+        Extract GPX data from the given file path, handling various encodings.
+
+        Arguments:
+        - gpx_path: Path to the GPX file.
+    """
+    gpx_file_path = Path(gpx_path)
+    if not gpx_file_path.exists():
+        raise SystemExit(f"GPX file not found: {gpx_path}")
 
-    return gpxpy.parse(gpx_text)
\ No newline at end of file
+    return extract_gpx_from_text(_decode_gpx_bytes(gpx_file_path.read_bytes()))
@@ -1,59 +1,118 @@
-import geojson
 import json
+import os
+import pickle
 import unicodedata
-from shapely.ops import nearest_points
-from pyproj import Geod
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Set
 
+import numpy as np
+import orjson
+import shapely
+from pyproj import Transformer
+
 from pathlib import Path
-from shapely.geometry import shape as geom_shape, GeometryCollection
-from model.Region import Region
 
-def compute_neighbours(
-    regions,
-    max_km: float
-) -> dict[str, Set[str]]:
-    """
-        Compute neighbour regions within `max_km` kilometers.
+# Belgian Lambert 2008 (EPSG:3812): all region geometries are stored in this
+# metric CRS, so containment and distance tests are plain Cartesian meters
+to_lambert = Transformer.from_crs(4326, 3812, always_xy=True)
 
-        Returns:
-        - Dict[str, Set[str]]: A mapping of region name -> set of neighbour region names.
+# bump when the shape or CRS of the cached preprocessed structures changes
+_CACHE_VERSION = 4
+
+# worker-side state for compute_neighbours, filled once per process by the
+# pool initializer so geometries are pickled to each worker only once
+_worker_state: dict = {}
+
+def _init_neighbour_worker(region_geoms, max_km: float) -> None:
+    _worker_state['geoms'] = region_geoms
+    # preparation is lost when the geometries are pickled to the worker
+    shapely.prepare(_worker_state['geoms'])
+    _worker_state['tree'] = shapely.STRtree(region_geoms)
+    _worker_state['max_km'] = max_km
+
+def _find_neighbour_pairs(indices) -> List[tuple]:
     """
-    geod = Geod(ellps="WGS84")
+        Worker task: return all neighbouring (i, j) index pairs with j > i for
+        the given slice of region indices.
+    """
+    geoms = _worker_state['geoms']
+    tree = _worker_state['tree']
+    max_km = _worker_state['max_km']
+
+    # geometries are in Belgian Lambert 2008, so distances and bounding-box
+    # padding are plain meters
     max_m = max_km * 1000.0
 
-    neighbors = {r.name: set() for r in regions}
+    pairs = []
+    for i in indices:
+        g1 = geoms[i]
+        if g1.is_empty:
+            continue
+
+        # R-tree prefilter: only regions whose bounding box falls within the
+        # padded box of region i can possibly be neighbours.
+        minx, miny, maxx, maxy = g1.bounds
+        search_box = shapely.box(minx - max_m, miny - max_m, maxx + max_m, maxy + max_m)
+
+        cand_idx = tree.query(search_box)
+        cand_idx = cand_idx[cand_idx > i]
+        if len(cand_idx) == 0:
+            continue
+        cands = geoms[cand_idx]
+
+        try:
+            # adjacency / intersection (excluding containment), one C loop per
+            # predicate over the whole candidate array instead of per pair
+            adjacent = shapely.touches(g1, cands) | (
+                shapely.intersects(g1, cands)
+                & ~(shapely.within(g1, cands) | shapely.within(cands, g1))
+            )
+            near = shapely.dwithin(g1, cands, max_m)
+        except Exception:
+            # skip invalid geometry comparisons
+            continue
 
-    for i, r1 in enumerate(regions):
-        print(f"{r1.name} ({i + 1}/{len(regions)})")
+        for j, is_adjacent, is_near in zip(cand_idx, adjacent, near):
+            if is_adjacent or is_near:
+                pairs.append((i, int(j)))
 
-        g1 = r1.geom
-        for r2 in regions[i + 1:]:
-            g2 = r2.geom
-            try:
-                # immediate adjacency / intersection test (excluding containment)
-                if g1.touches(g2) or (g1.intersects(g2) and not (g1.within(g2) or g2.within(g1))):
-                    neighbors[r1.name].add(r2.name)
-                    neighbors[r2.name].add(r1.name)
-                    continue
+    return pairs
 
-                # skip empty geometries
-                if g1.is_empty or g2.is_empty:
-                    continue
+def compute_neighbours(
+    region_names: np.ndarray,
+    region_geoms: np.ndarray,
+    max_km: float
+) -> dict[str, Set[str]]:
+    """
+        Compute neighbour regions within `max_km` kilometers.
 
-                # find nearest boundary points and compute geodesic distance (meters)
-                p1, p2 = nearest_points(g1, g2)  # returns (Point on g1, Point on g2)
-                lon1, lat1 = p1.x, p1.y
-                lon2, lat2 = p2.x, p2.y
+        The pair tests are split across all CPU cores; each worker receives the
+        geometry array once and reports back the neighbouring index pairs it found.
 
-                _, _, dist_m = geod.inv(lon1, lat1, lon2, lat2)
-                if dist_m <= max_m:
-                    neighbors[r1.name].add(r2.name)
-                    neighbors[r2.name].add(r1.name)
+        Arguments:
+        - region_names: array of region names, parallel to `region_geoms`.
+        - region_geoms: array of region geometries.
+        - max_km: the neighbour distance threshold in kilometers.
 
-            except Exception:
-                # skip invalid geometry comparisons
-                continue
+        Returns:
+        - Dict[str, Set[str]]: A mapping of region name -> set of neighbour region names.
+    """
+    neighbors = {name: set() for name in region_names}
+
+    n_workers = os.cpu_count() or 1
+    # round-robin index slices keep the per-worker load roughly even
+    chunks = [range(start, len(region_names), n_workers) for start in range(n_workers)]
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_neighbour_worker,
+        initargs=(region_geoms, max_km),
+    ) as executor:
+        for done, pairs in enumerate(executor.map(_find_neighbour_pairs, chunks), start=1):
+            print(f"chunk {done}/{len(chunks)} done")
+            for i, j in pairs:
+                neighbors[region_names[i]].add(region_names[j])
+                neighbors[region_names[j]].add(region_names[i])
 
     return {name: sorted(list(nb)) for name, nb in neighbors.items()}
 
@@ -81,8 +140,8 @@ def load_neighbours(path: str) -> Dict[str, List[str]]:
         - path: Path to load the neighbor_map JSON file from.
     """
     p = Path(path)
-    with p.open('r', encoding='utf-8') as f:
-        return json.load(f)
+    with p.open('rb') as f:
+        return orjson.loads(f.read())
 
 def fix_mojibake(s: str) -> str:
     """
@@ -101,98 +160,113 @@ def fix_mojibake(s: str) -> str:
             return s
     return s
 
+def _project_to_lambert(coords: np.ndarray) -> np.ndarray:
+    """
+        Transform an (N, 2) array of lon/lat coordinates to Belgian Lambert 2008.
+    """
+    xs, ys = to_lambert.transform(coords[:, 0], coords[:, 1])
+    return np.column_stack([xs, ys])
+
+def _input_fingerprint(paths) -> tuple:
+    """
+        Fingerprint the input files by size and mtime, to detect stale caches.
+    """
+    return tuple((str(p), Path(p).stat().st_size, Path(p).stat().st_mtime_ns) for p in paths)
+
 def preprocess_data(
     neighbours_mapping_path: str,
-    provinces_mapping_path: str,
-    provinces_geojson_path: str,
     municipalities_geojson_path: str
 ):
     """
-        Preprocess the data and return the region map, neighbour map, provinces lookup and provinces regions map.
+        Preprocess the data into parallel arrays and return them with the STRtree.
+
+        The built structures are cached to a pickle next to the municipalities
+        GeoJSON; as long as the input files are unchanged, later startups load
+        the cache instead of re-parsing the GeoJSON and rebuilding geometries.
 
         Arguments:
         - neighbours_mapping_path: path to the neighbours mapping JSON file.
-        - provinces_mapping_path: path to the provinces mapping JSON file.
-        - provinces_geojson_path: path to the provinces GeoJSON file.
         - municipalities_geojson_path: path to the municipalities GeoJSON file.
 
         Returns:
-        - region_map: A mapping of region names to Region objects.
-        - neighbour_map: A mapping of region names to lists of neighbouring region names.
-        - provinces_lookup: A list of Region objects representing provinces.
-        - provinces_regions_map: A mapping of province names to lists of Region objects within those provinces
+        - region_names: array of region names; positions match `region_geoms` and the tree.
+        - region_geoms: array of prepared region geometries.
+        - neighbour_idx: A mapping of region index to an array of neighbouring region indices.
+        - tree: An STRtree over `region_geoms`.
     """
+    cache_path = Path(municipalities_geojson_path).with_name("preprocessed.pkl")
+    fingerprint = _input_fingerprint([neighbours_mapping_path, municipalities_geojson_path])
+
+    if cache_path.exists():
+        try:
+            with cache_path.open('rb') as f:
+                cached_version, cached_fingerprint, payload = pickle.load(f)
+            if cached_version == _CACHE_VERSION and cached_fingerprint == fingerprint:
+                region_names, region_geoms, neighbour_idx, tree = payload
+                # preparation does not survive pickling, redo it once
+                shapely.prepare(region_geoms)
+                return region_names, region_geoms, neighbour_idx, tree
+        except Exception:
+            # corrupt or incompatible cache, rebuild from the inputs
+            pass
+
     neighbour_map = load_neighbours(neighbours_mapping_path)
-    province_map = json.load(open(provinces_mapping_path, 'r', encoding='utf-8'))
 
-    province_names = ["WEST-VLAANDEREN", "OOST-VLAANDEREN", "ANTWERPEN", "LIMBURG", "VLAAMS-BRABANT", "BRUSSEL",
-                      "BRABANT WALLON", "NAMUR", "LIÈGE", "HAINAUT", "LUXEMBOURG"]
-    provinces_regions_map = {}
+    with open(municipalities_geojson_path, 'rb') as f:
+        municipalities_geojson_data = orjson.loads(f.read())
+
+    features = municipalities_geojson_data['features']
+
+    # re-serialize just the geometry members and hand them to shapely in one
+    # batch; from_geojson builds the whole geometry array in C
+    empty_geojson = orjson.dumps({"type": "GeometryCollection", "geometries": []})
+    geometry_blobs = np.array([
+        orjson.dumps(feature['geometry']) if feature.get('geometry') else empty_geojson
+        for feature in features
+    ])
+    geoms = shapely.from_geojson(geometry_blobs)
 
-    for province_name in province_names:
-        provinces_regions_map[province_name] = []
+    # reproject once to Belgian Lambert 2008 (EPSG:3812); all later containment
+    # and distance tests are then pure Cartesian in meters
+    geoms = shapely.transform(geoms, _project_to_lambert)
 
-    municipalities_geojson_data = geojson.load(open(municipalities_geojson_path))
-    region_map = {}
-    regions = []
+    # a 10 m simplification is far below GPS accuracy but cuts vertex counts
+    # (and memory) several-fold; bordering regions may shift their shared edge
+    # by up to the tolerance, which is acceptable since points that close to a
+    # border are ambiguous anyway
+    geoms = shapely.simplify(geoms, tolerance=10.0, preserve_topology=True)
 
-    for feature in municipalities_geojson_data['features']:
+    names = []
+    for feature in features:
         raw = feature['properties'].get('Communes', '')
         raw = fix_mojibake(raw)
-        name = unicodedata.normalize('NFC', raw).upper()
-
-        geometry = feature.get("geometry", {})
-        geom_type = geometry.get("type", "").lower()
-        coords = geometry.get("coordinates", [])
-
-        if not geom_type or not coords:
-            shapely_geom = GeometryCollection()
-        else:
-            if geom_type == "polygon":
-                coords = [coords]
-                geom_type = "multipolygon"
-            geom_mapping = {"type": geom_type.title(), "coordinates": coords}
-            shapely_geom = geom_shape(geom_mapping)
-
-        region = Region(name, shapely_geom)
-        regions.append(region)
-        region_map[name] = region
-
-        province_name = province_map[name]
-        provinces_regions_map[province_name].append(region)
-
-    provinces_lookup = []
-    provinces_name_mapping = {
-        "West-Vlaanderen": "WEST-VLAANDEREN",
-        "Oost-Vlaanderen": "OOST-VLAANDEREN",
-        "Antwerpen": "ANTWERPEN",
-        "Limburg": "LIMBURG",
-        "Vlaams Brabant": "VLAAMS-BRABANT",
-        "Brussel": "BRUSSEL",
-        "Waals Brabant": "BRABANT WALLON",
-        "Namen": "NAMUR",
-        "Luik": "LIÈGE",
-        "Henegouwen": "HAINAUT",
-        "Luxemburg": "LUXEMBOURG"
+        names.append(unicodedata.normalize('NFC', raw).upper())
+
+    # structure-of-arrays layout: names and geometries live in parallel arrays
+    # in tree order, so batched query results index straight into the names
+    region_names = np.array(names)
+    region_geoms = geoms
+
+    # prepare once so every later covers/contains query hits the cached edge index
+    shapely.prepare(region_geoms)
+
+    # neighbour relations as index arrays, so the hot path never hashes strings
+    name_to_idx = {name: i for i, name in enumerate(names)}
+    neighbour_idx = {
+        i: np.array(
+            [name_to_idx[n] for n in neighbour_map.get(name, []) if n in name_to_idx],
+            dtype=np.intp,
+        )
+        for i, name in enumerate(names)
     }
 
-    provinces_geojson_data = geojson.load(open(provinces_geojson_path))
-    for feature in provinces_geojson_data['features']:
-        name = provinces_name_mapping[feature['properties']['NE_Name']]
-        geometry = feature.get("geometry", {})
-        geom_type = geometry.get("type", "").lower()
-        coords = geometry.get("coordinates", [])
-
-        if not geom_type or not coords:
-            shapely_geom = GeometryCollection()
-        else:
-            if geom_type == "polygon":
-                coords = [coords]
-                geom_type = "multipolygon"
-            geom_mapping = {"type": geom_type.title(), "coordinates": coords}
-            shapely_geom = geom_shape(geom_mapping)
-
-        region = Region(name, shapely_geom)
-        provinces_lookup.append(region)
-
-    return region_map, neighbour_map, provinces_lookup, provinces_regions_map
\ No newline at end of file
+    tree = shapely.STRtree(region_geoms)
+
+    try:
+        with cache_path.open('wb') as f:
+            pickle.dump((_CACHE_VERSION, fingerprint, (region_names, region_geoms, neighbour_idx, tree)), f)
+    except OSError:
+        # cache is an optimization only; a read-only data dir is fine
+        pass
+
+    return region_names, region_geoms, neighbour_idx, tree
\ No newline at end of file